@@ -1,10 +1,13 @@
 """ This is the main module that contains the code for the Dolt backed Version Control plugin. """
+from functools import lru_cache
+
 try:
     from importlib import metadata
 except ImportError:
     # Python version < 3.8
     import importlib_metadata as metadata
 
+from django.apps import apps
 from django.db.models.signals import pre_migrate, post_migrate
 import django_tables2
 
@@ -142,10 +145,12 @@ __VERSIONED_MODEL_REGISTRY___ = {
 }
 
 
+@lru_cache(maxsize=1024)
 def is_versioned_model(model):
     """
     Determines whether a model's is under version control.
     See __MODELS_UNDER_VERSION_CONTROL__ for more info.
+    Results are cached per model, as the router asks for every query.
     """
     registry = __VERSIONED_MODEL_REGISTRY___
     return bool(query_registry(model, registry))
@@ -185,22 +190,48 @@ def register_versioned_models(registry):
                 # v must be bool
                 raise err
     __VERSIONED_MODEL_REGISTRY___.update(registry)
+    is_versioned_model.cache_clear()
 
 
 __DIFF_TABLE_REGISTRY__ = {}
 
+# The plugin's default diff tables are registered on first use, so that
+# Nautobot's table modules aren't imported until a diff is rendered.
+__DEFAULT_DIFF_TABLES_REGISTERED__ = False
+
+
+def diff_table_registry():
+    """
+    Returns the `__DIFF_TABLE_REGISTRY__`, after registering the default
+    tables for Nautobot's core models. Tables registered with
+    `register_diff_tables()` take precedence over the default table of their model.
+    """
+    global __DEFAULT_DIFF_TABLES_REGISTERED__
+    if not __DEFAULT_DIFF_TABLES_REGISTERED__:
+        from nautobot_version_control.diffs import _default_diff_tables  # pylint: disable=C0415
+
+        for app_label, tables in _default_diff_tables().items():
+            # merge per model, a registered table only replaces the default table of its own model
+            app_tables = __DIFF_TABLE_REGISTRY__.setdefault(app_label, {})
+            for model, table in tables.items():
+                app_tables.setdefault(model, table)
+        __DEFAULT_DIFF_TABLES_REGISTERED__ = True
+        invalidate_diffable_content_types()
+    return __DIFF_TABLE_REGISTRY__
+
 
 def diff_table_for_model(model):
     """
     Returns a table object for a model, if it exists in
     the ` __DIFF_TABLE_REGISTRY__`.
     """
-    return query_registry(model, __DIFF_TABLE_REGISTRY__)
+    return query_registry(model, diff_table_registry())
 
 
 def register_diff_tables(registry):
     """Register additional tables to be used in diffs.
     Registry values must be subclasses of django_tables2.Table.
+    Tables are registered per model, the other tables of an app label are kept.
 
     Args:
         registry: a python dict of content types that
@@ -229,7 +260,43 @@ def register_diff_tables(registry):
             if not issubclass(v, django_tables2.tables.Table):
                 # v must be Table
                 raise err
-    __DIFF_TABLE_REGISTRY__.update(registry)
+    for app_label, tables in registry.items():
+        __DIFF_TABLE_REGISTRY__.setdefault(app_label, {}).update(tables)
+    invalidate_diffable_content_types()
+
+
+# Cache of `(model, content_type, db_table)` tuples for every
+# model in the `__DIFF_TABLE_REGISTRY__`. Built lazily on first use, as
+# ContentTypes can't be queried before the app registry is ready.
+__DIFFABLE_CONTENT_TYPES__ = None
+
+
+def diffable_content_types():
+    """
+    Returns a list of `(model, content_type, db_table)` tuples for
+    every model that has a table in the `__DIFF_TABLE_REGISTRY__`.
+    The list is computed once and reused until the registry changes.
+    """
+    global __DIFFABLE_CONTENT_TYPES__
+    if __DIFFABLE_CONTENT_TYPES__ is None:
+        from django.contrib.contenttypes.models import ContentType  # pylint: disable=C0415
+
+        models = []
+        for app_label, tables in diff_table_registry().items():
+            for model_name in tables:
+                try:
+                    models.append(apps.get_model(app_label, model_name))
+                except LookupError:
+                    continue
+        content_types = ContentType.objects.get_for_models(*models)
+        __DIFFABLE_CONTENT_TYPES__ = [(m, content_types[m], m._meta.db_table) for m in models]
+    return __DIFFABLE_CONTENT_TYPES__
+
+
+def invalidate_diffable_content_types():
+    """Clears the cache used by `diffable_content_types()`."""
+    global __DIFFABLE_CONTENT_TYPES__
+    __DIFFABLE_CONTENT_TYPES__ = None
 
 
 __GLOBAL_ROUTER_SWITCH__ = True
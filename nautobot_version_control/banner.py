@@ -13,6 +13,7 @@ def banner(context, *args, **kwargs):
     """Show a banner indicating the current active branch, if the user is logged in."""
     if not context.request.user.is_authenticated:
         return None
+    # served from the branch checked out by `DoltBranchMiddleware`, without a query
     branch_name = active_branch()
     return PluginBanner(
         content=format_html(
@@ -10,3 +10,11 @@ GLOBAL_DB = "global"
 DOLT_DEFAULT_BRANCH = "main"
 
 DOLT_BRANCH_KEYWORD = "dolt-branch"
+
+# cache key and timeout (seconds) of the set of branch names
+BRANCH_NAMES_CACHE_KEY = "nautobot_version_control:branch_names"
+
+BRANCH_NAMES_CACHE_TIMEOUT = 30
+
+# maximum length of an automatic commit message
+COMMIT_MESSAGE_MAX_LENGTH = 4096
@@ -1,22 +1,21 @@
 """Diffs.py contains a set of utilities for producing Dolt diffs."""
 
-from django.contrib.contenttypes.models import ContentType
-from django.db import connection
+from functools import lru_cache
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection, connections
 from django.db import models
+from django.db.models import prefetch_related_objects
 from django.db.models.expressions import RawSQL
 
-from nautobot.circuits import tables as circuits_tables
-from nautobot.dcim.tables import cables, devices, devicetypes, power, racks, sites
-from nautobot.extras import tables as extras_tables
-from nautobot.ipam import tables as ipam_tables
-from nautobot.tenancy import tables as tenancy_tables
-from nautobot.virtualization import tables as virtualization_tables
+from django_tables2.utils import Accessor
 
 from nautobot_version_control.dynamic.diff_factory import DiffListViewFactory
 from nautobot_version_control.models import Commit
-from nautobot_version_control.utils import db_for_commit
+from nautobot_version_control.utils import db_for_commit, unbuffered_cursor
 
-from . import diff_table_for_model, register_diff_tables
+from . import diff_table_for_model, diffable_content_types
 
 
 def three_dot_diffs(from_commit=None, to_commit=None):
@@ -33,114 +32,247 @@ def two_dot_diffs(from_commit=None, to_commit=None):
         raise ValueError("must specify both a to_commit and from_commit")
 
     diff_results = []
-    for content_type in ContentType.objects.all():
-        model = content_type.model_class()
-        if not model:
-            continue
-        if not diff_table_for_model(model):
-            continue
-
-        ct_meta = content_type.model_class()._meta
-        tbl_name = ct_meta.db_table
-        verbose_name = str(ct_meta.verbose_name.capitalize())
-
-        to_queryset = (
-            content_type.model_class()
-            .objects.filter(
-                pk__in=RawSQL(  # nosec
-                    f"""SELECT to_id FROM dolt_commit_diff_{tbl_name}
-                        WHERE to_commit = %s AND from_commit = %s""",
-                    (to_commit, from_commit),
-                )
-            )
-            .annotate(
-                # Annotate each row with a JSON-ified diff
-                diff=RawSQL(  # nosec
-                    f"""SELECT JSON_OBJECT("root", "to", {json_diff_fields(tbl_name)})
-                        FROM dolt_commit_diff_{tbl_name}
-                        WHERE to_commit = %s AND from_commit = %s
-                        AND to_id = {tbl_name}.id """,
-                    (to_commit, from_commit),
-                    output_field=models.JSONField(),
-                )
-            )
-            # "time-travel" query the database at `to_commit`
-            .using(db_for_commit(to_commit))
-        )
-
-        from_queryset = (
-            content_type.model_class()
-            .objects.filter(
-                # add the `diff_type = 'removed'` clause, because we only want deleted
-                # rows in this queryset. modified rows come from the `to_queryset`
-                pk__in=RawSQL(  # nosec
-                    f"""SELECT from_id FROM dolt_commit_diff_{tbl_name}
-                        WHERE to_commit = %s AND from_commit = %s AND diff_type = 'removed' """,
-                    (to_commit, from_commit),
-                )
-            )
-            .annotate(
-                # Annotate each row with a JSON-ified diff
-                diff=RawSQL(  # nosec
-                    f"""SELECT JSON_OBJECT("root", "from", {json_diff_fields(tbl_name)})
-                        FROM dolt_commit_diff_{tbl_name}
-                        WHERE to_commit = %s AND from_commit = %s
-                        AND from_id = {tbl_name}.id """,
-                    (to_commit, from_commit),
-                    output_field=models.JSONField(),
-                )
-            )
-            # "time-travel" query the database at `from_commit`
-            .using(db_for_commit(from_commit))
-        )
-        diff_rows = sorted(list(to_queryset) + list(from_queryset), key=lambda d: d.pk)
+    for content_type, model, tbl_name, added, modified, removed in content_types_with_diffs(from_commit, to_commit):
+        verbose_name = str(model._meta.verbose_name.capitalize())
+        factory = DiffListViewFactory(content_type)
+        # only build the JSON diff of the columns the diff table renders
+        columns = factory.display_columns()
+        to_queryset, from_queryset = diff_querysets(model, tbl_name, columns, from_commit, to_commit)
+        # the diff summary tells which querysets have rows, don't query the others
+        to_rows = stream_rows(to_queryset) if added or modified else []
+        from_rows = stream_rows(from_queryset) if removed else []
+        # both querysets are ordered by pk, sorting their concatenation only merges the two runs
+        diff_rows = sorted(to_rows + from_rows, key=attrgetter("pk"))
         if len(diff_rows) == 0:
             continue
 
-        diff_view_table = DiffListViewFactory(content_type).get_table_model()
+        diff_view_table = factory.get_table_model()
         diff_results.append(
             {
                 "name": f"{verbose_name} Diffs",
                 "table": diff_view_table(diff_rows),
-                **diff_summary_for_table(tbl_name, from_commit, to_commit),
+                "added": added,
+                "modified": modified,
+                "removed": removed,
             }
         )
     return diff_results
 
 
-def diff_summary_for_table(table, from_commit, to_commit):
-    """diff_summary_for_table returns the diff summary for table, for the commits from_commit and to_commit."""
-    summary = {
-        "added": 0,
-        "modified": 0,
-        "removed": 0,
-    }
-    with connection.cursor() as cursor:
-        cursor.execute(
-            f"""SELECT diff_type, count(diff_type) FROM dolt_commit_diff_{table}  # nosec
-                WHERE to_commit = %s AND from_commit = %s
-                GROUP BY diff_type ORDER BY diff_type""",  # nosec
-            (to_commit, from_commit),
+def diff_querysets(model, tbl_name, columns, from_commit, to_commit):
+    """
+    diff_querysets returns the `(to_queryset, from_queryset)` of model between from_commit
+    and to_commit, each row annotated with the JSON diff of the given columns.
+    The to_queryset holds the added and modified rows, the from_queryset the removed rows.
+    """
+    select_fields, prefetch_fields = diff_table_select_prefetch(model)
+    diff_tbl = f"dolt_commit_diff_{tbl_name}"
+    # each queryset runs on the database of its commit, build its JSON diff from that schema
+    to_fields = json_diff_fields(tbl_name, columns, to_commit)
+    from_fields = json_diff_fields(tbl_name, columns, from_commit)
+    commits = [str(to_commit), str(from_commit)]
+
+    to_queryset = (
+        # join each row to its diff, rather than looking the diff up
+        # with a correlated subquery per row
+        model.objects.extra(  # nosec
+            tables=[diff_tbl],
+            where=[
+                f"{diff_tbl}.to_id = {tbl_name}.id",
+                f"{diff_tbl}.to_commit = %s",
+                f"{diff_tbl}.from_commit = %s",
+            ],
+            params=commits,
+        )
+        .annotate(
+            # Annotate each row with a JSON-ified diff
+            diff=RawSQL(  # nosec
+                f"""JSON_OBJECT("root", "to", {to_fields})""",
+                (),
+                output_field=models.JSONField(),
+            )
+        )
+        .order_by("pk")
+        # "time-travel" query the database at `to_commit`
+        .using(db_for_commit(to_commit))
+    )
+
+    from_queryset = (
+        model.objects.extra(  # nosec
+            tables=[diff_tbl],
+            # add the `diff_type = 'removed'` clause, because we only want deleted
+            # rows in this queryset. modified rows come from the `to_queryset`
+            where=[
+                f"{diff_tbl}.from_id = {tbl_name}.id",
+                f"{diff_tbl}.to_commit = %s",
+                f"{diff_tbl}.from_commit = %s",
+                f"{diff_tbl}.diff_type = 'removed'",
+            ],
+            params=commits,
+        )
+        .annotate(
+            # Annotate each row with a JSON-ified diff
+            diff=RawSQL(  # nosec
+                f"""JSON_OBJECT("root", "from", {from_fields})""",
+                (),
+                output_field=models.JSONField(),
+            )
         )
-        for diff_type, count in cursor.fetchall():
-            summary[diff_type] = count
-    return summary
+        .order_by("pk")
+        # "time-travel" query the database at `from_commit`
+        .using(db_for_commit(from_commit))
+    )
+    if select_fields:
+        # select_related() without fields follows every non-null foreign key
+        to_queryset = to_queryset.select_related(*select_fields)
+        from_queryset = from_queryset.select_related(*select_fields)
+    if prefetch_fields:
+        to_queryset = to_queryset.prefetch_related(*prefetch_fields)
+        from_queryset = from_queryset.prefetch_related(*prefetch_fields)
+    return to_queryset, from_queryset
 
 
-def json_diff_fields(tbl_name):
+def stream_rows(queryset, chunk_size=1000):
     """
-    json_diff_fields returns all of the column names for a model
-    and turns them into to_ and from_ fields.
+    stream_rows evaluates queryset through an unbuffered cursor and returns its rows.
+    Prefetches run once the rows have been read, as the connection can't be shared
+    with another query while streaming.
+    """
+    lookups = queryset._prefetch_related_lookups  # pylint: disable=W0212
+    with unbuffered_cursor(queryset.db):
+        rows = list(queryset.prefetch_related(None).iterator(chunk_size=chunk_size))
+    prefetch_related_objects(rows, *lookups)
+    return rows
+
+
+def content_types_with_diffs(from_commit, to_commit):
     """
+    content_types_with_diffs returns `(content_type, model, db_table, added, modified, removed)`
+    tuples for the diffable models that have changes between from_commit and to_commit.
+    The diff tables of all models are summarized in a single UNION ALL query.
+    """
+    diffable = diffable_content_types()
+    if not diffable:
+        return []
+
+    query = " UNION ALL ".join(
+        f"""(SELECT %s,
+                COALESCE(SUM(diff_type = 'added'), 0),
+                COALESCE(SUM(diff_type = 'modified'), 0),
+                COALESCE(SUM(diff_type = 'removed'), 0)
+            FROM dolt_commit_diff_{tbl_name}
+            WHERE to_commit = %s AND from_commit = %s)"""  # nosec
+        for _, _, tbl_name in diffable
+    )
+    params = []
+    for _, content_type, _ in diffable:
+        params.extend((content_type.pk, str(to_commit), str(from_commit)))
+
     with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        summaries = {row[0]: tuple(int(c) for c in row[1:]) for row in cursor.fetchall() if any(row[1:])}
+
+    # the ContentTypes are cached with the diffable models, no need to query them
+    return [
+        (content_type, model, tbl_name, *summaries[content_type.pk])
+        for model, content_type, tbl_name in diffable
+        if content_type.pk in summaries
+    ]
+
+
+def diff_table_select_prefetch(model):
+    """
+    diff_table_select_prefetch returns the `(select_related, prefetch_related)`
+    lookups for the relations rendered by the diff table of model, so that
+    rendering the table doesn't issue a query per row.
+    """
+    select_fields, prefetch_fields = set(), set()
+    for name, column in diff_table_for_model(model).base_columns.items():
+        path, related_model, many = [], model, False
+        for bit in Accessor(column.accessor or name).bits:
+            try:
+                field = related_model._meta.get_field(bit)
+            except FieldDoesNotExist:
+                break
+            if not field.is_relation or field.related_model is None:
+                # concrete field, or a GenericForeignKey
+                break
+            path.append(bit)
+            many = many or field.many_to_many or field.one_to_many
+            related_model = field.related_model
+        if path:
+            lookup = "__".join(path)
+            if many:
+                prefetch_fields.add(lookup)
+            else:
+                select_fields.add(lookup)
+    return sorted(select_fields), sorted(prefetch_fields)
+
+
+# diff table columns that describe the diff rather than the model
+DIFF_META_COLUMNS = ("diff_type", "to_commit", "to_commit_date", "from_commit", "from_commit_date")
+
+
+@lru_cache(maxsize=1024)
+def diff_table_columns(commit, tbl_name):
+    """
+    diff_table_columns returns the column names of the diff table of tbl_name, described on the
+    database of commit. Commits are immutable, so the columns are cached per commit and table.
+    """
+    with connections[db_for_commit(commit)].cursor() as cursor:
         cursor.execute(f"DESCRIBE dolt_commit_diff_{tbl_name}")
-        cols = cursor.fetchall()
-    pairs = (f"'{c[0]}', dolt_commit_diff_{tbl_name}.{c[0]}" for c in cols)
+        return tuple(c[0] for c in cursor.fetchall())
+
+
+def json_diff_fields(tbl_name, columns, commit):
+    """
+    json_diff_fields returns the column names for a model and turns them into to_ and from_ fields,
+    following the schema of the diff table at commit.
+
+    Only the fields rendered by the diff table are returned (`columns`, see
+    `DiffListViewFactory.display_columns()`), along with the diff metadata and a
+    `num_changed` count of all modified fields, computed by the database.
+    """
+    diff_tbl = f"dolt_commit_diff_{tbl_name}"
+    cols = diff_table_columns(str(commit), tbl_name)
+
+    def displayed(col):
+        if col.startswith("to_"):
+            name = col[3:]
+        elif col.startswith("from_"):
+            name = col[5:]
+        else:
+            return False
+        # the diff table only reads `to_<column>` and `from_<column>`, foreign keys
+        # stored as `<column>_id` are counted by `num_changed` but not rendered
+        return name in columns
+
+    fields = [c for c in cols if c in DIFF_META_COLUMNS or displayed(c)]
+    changed = [
+        f"(NOT ({diff_tbl}.{c} <=> {diff_tbl}.from_{c[3:]}))"
+        for c in cols
+        if c.startswith("to_") and c not in DIFF_META_COLUMNS and f"from_{c[3:]}" in cols
+    ]
+    pairs = [f"'{c}', {diff_tbl}.{c}" for c in fields]
+    pairs.append(f"'num_changed', {' + '.join(changed) or '0'}")
     return ", ".join(pairs)
 
 
-register_diff_tables(
-    {
+def _default_diff_tables():
+    """
+    _default_diff_tables returns the diff table registry for Nautobot's core models.
+    Nautobot's table modules are imported here rather than at module import, as they
+    are only needed once a diff is rendered.
+    """
+    # pylint: disable=C0415
+    from nautobot.circuits import tables as circuits_tables
+    from nautobot.dcim.tables import cables, devices, devicetypes, power, racks, sites
+    from nautobot.extras import tables as extras_tables
+    from nautobot.ipam import tables as ipam_tables
+    from nautobot.tenancy import tables as tenancy_tables
+    from nautobot.virtualization import tables as virtualization_tables
+
+    return {
         "circuits": {
             "circuit": circuits_tables.CircuitTable,
             # "circuittermination": None,
@@ -224,4 +356,3 @@ register_diff_tables(
             "vminterface": virtualization_tables.VMInterfaceTable,
         },
     }
-)
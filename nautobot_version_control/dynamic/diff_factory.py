@@ -51,6 +51,10 @@ class DiffListViewFactory:
         except KeyError as e:
             raise e
 
+    def display_columns(self):
+        """display_columns returns the names of the columns rendered by the diff table."""
+        return set(diff_table_for_model(self.ct.model_class()).base_columns)
+
     def _get_table_meta(self, table):
         meta = copy.deepcopy(table._meta)
         # add diff styling
@@ -131,25 +135,8 @@ class DiffListViewBase(tables.Table):
 
     @staticmethod
     def count_diffs(diff):
-        """count_diffs counts the numbers of diffs."""
-        skip_fields = (
-            "root",
-            "diff_type",
-            "to_commit",
-            "to_commit_date",
-            "from_commit",
-            "from_commit_date",
-        )
-        cnt = 0
-        for k, v in diff.items():
-            if k in skip_fields:
-                continue
-            if k.startswith("to_"):
-                # compare to and from values
-                from_key = f"from_{k[3:]}"
-                if v != diff[from_key]:
-                    cnt += 1
-        return cnt
+        """count_diffs returns the number of modified fields, counted by the database (see `json_diff_fields()`)."""
+        return diff["num_changed"]
 
     @staticmethod
     def wrap_render_func(fn):
@@ -14,7 +14,7 @@ from nautobot_version_control.models import (
     ConstraintViolations,
     Commit,
 )
-from nautobot_version_control.utils import author_from_user, query_on_branch
+from nautobot_version_control.utils import author_from_user, cache_active_branch, query_on_branch
 from nautobot_version_control.tables import (
     ConflictsTable,
     ConstraintViolationsTable,
@@ -105,16 +105,18 @@ def make_merge_candidate(src, dest):
     with connection.cursor() as cursor:
         cursor.execute("SET @@dolt_force_transaction_commit = 1;")
         cursor.execute("""SELECT dolt_checkout(%s) FROM dual;""", [name])
+        cache_active_branch(name)
         cursor.execute("""SELECT dolt_merge(%s) FROM dual;""", [src])
         cursor.execute("""SELECT dolt_add("-A") FROM dual;""")
         msg = f"""creating merge candidate with src: "{src}" and dest: "{dest}"."""
         cursor.execute(
-            f"""SELECT dolt_commit(
+            """SELECT dolt_commit(
                     '--force',
                     '--all',
                     '--allow-empty',
-                    '--message', '{msg}',
-                    '--author', '{author_from_user(None)}') FROM dual;"""
+                    '--message', %s,
+                    '--author', %s) FROM dual;""",
+            [msg, author_from_user(None)],
         )
     return Branch.objects.get(name=name)
 
@@ -1,6 +1,8 @@
 """middleware.py contains the middleware add-ons needed for the Version Control plugin to work."""
 
+from django.conf import settings
 from django.contrib import messages
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.models.signals import m2m_changed, post_save, pre_delete
 from django.http import HttpResponse
@@ -10,11 +12,13 @@ from django.utils.safestring import mark_safe
 from nautobot.extras.models.change_logging import ObjectChange
 
 from nautobot_version_control.constants import (
+    BRANCH_NAMES_CACHE_KEY,
+    COMMIT_MESSAGE_MAX_LENGTH,
     DOLT_BRANCH_KEYWORD,
     DOLT_DEFAULT_BRANCH,
 )
 from nautobot_version_control.models import Branch, Commit
-from nautobot_version_control.utils import DoltError
+from nautobot_version_control.utils import DoltError, cached_active_branch
 
 
 def dolt_health_check_intercept_middleware(get_response):
@@ -24,7 +28,7 @@ def dolt_health_check_intercept_middleware(get_response):
     """
 
     def middleware(request):
-        if "/health" in request.path:
+        if is_health_check(request):
             return HttpResponse(status=201)
         return get_response(request)
 
@@ -46,6 +50,10 @@ class DoltBranchMiddleware:
         process_view maintains the dolt branch session cookie and verifies authentication. It then returns the
         view that needs to be rendered.
         """
+        if is_health_check(request) or is_static_request(request):
+            # these requests don't read or write versioned data
+            return None
+
         # Check whether the desired branch was passed in as a querystring
         query_string_branch = request.GET.get(DOLT_BRANCH_KEYWORD, None)
         if query_string_branch is not None:
@@ -55,7 +63,13 @@ class DoltBranchMiddleware:
 
         branch = DoltBranchMiddleware.get_branch(request)
         try:
-            branch.checkout()
+            try:
+                DoltBranchMiddleware.checkout_branch(branch)
+            except Exception:  # pylint: disable=W0703
+                # the cached branch names may be stale, look the branch up again
+                cache.delete(BRANCH_NAMES_CACHE_KEY)
+                branch = DoltBranchMiddleware.get_branch(request, use_cache=False)
+                DoltBranchMiddleware.checkout_branch(branch)
         except Exception as e:
             msg = f"could not checkout branch {branch}: {str(e)}"
             messages.error(request, mark_safe(msg))
@@ -67,10 +81,17 @@ class DoltBranchMiddleware:
             return redirect(request.path)
 
     @staticmethod
-    def get_branch(request):
-        """get_branch returns the Branch object of the branch stored in the session cookie."""
+    def get_branch(request, use_cache=True):
+        """
+        get_branch returns the Branch object of the branch stored in the session cookie.
+        Unless use_cache is False, a branch found in the cached branch names isn't fetched.
+        """
         # lookup the active branch in the session cookie
         requested = branch_from_request(request)
+        if use_cache and requested in Branch.cached_names():
+            # the branch is only checked out, so there's no need to fetch its row.
+            # The unsaved Branch is always checked out, see `checkout_branch()`
+            return Branch(name=requested)
         try:
             return Branch.objects.get(pk=requested)
         except ObjectDoesNotExist:
@@ -81,6 +102,18 @@ class DoltBranchMiddleware:
             request.session[DOLT_BRANCH_KEYWORD] = DOLT_DEFAULT_BRANCH
             return Branch.objects.get(pk=DOLT_DEFAULT_BRANCH)
 
+    @staticmethod
+    def checkout_branch(branch):
+        """
+        checkout_branch checks out branch, unless the connection is already on it and
+        the branch has been looked up in the database.
+        """
+        # a persistent connection may still have the branch checked out from a previous request.
+        # A branch from the cached branch names may have been deleted since, so it's checked out
+        # regardless, which fails for a deleted branch.
+        if branch._state.adding or cached_active_branch() != branch.name:  # pylint: disable=W0212
+            branch.checkout()
+
 
 class DoltAutoCommitMiddleware:
     """
@@ -93,6 +126,9 @@ class DoltAutoCommitMiddleware:
 
     def __call__(self, request):
         """Override call."""
+        if is_health_check(request) or is_static_request(request):
+            return self.get_response(request)
+
         # Process the request with auto-dolt-commit enabled
         with AutoDoltCommit(request):
             return self.get_response(request)
@@ -112,7 +148,7 @@ class AutoDoltCommit:
     def __enter__(self):
         # Connect our receivers to the post_save and post_delete signals.
         post_save.connect(self._handle_update, dispatch_uid="dolt_commit_update")
-        m2m_changed.connect(self._handle_update, dispatch_uid="dolt_commit_update")
+        m2m_changed.connect(self._handle_m2m, dispatch_uid="dolt_commit_m2m")
         pre_delete.connect(self._handle_delete, dispatch_uid="dolt_commit_delete")
 
     def __exit__(self, type, value, traceback):  # pylint: disable=W0622
@@ -122,12 +158,12 @@ class AutoDoltCommit:
         # Disconnect change logging signals. This is necessary to avoid recording any errant
         # changes during test cleanup.
         post_save.disconnect(self._handle_update, dispatch_uid="dolt_commit_update")
-        m2m_changed.disconnect(self._handle_update, dispatch_uid="dolt_commit_update")
+        m2m_changed.disconnect(self._handle_m2m, dispatch_uid="dolt_commit_m2m")
         pre_delete.disconnect(self._handle_delete, dispatch_uid="dolt_commit_delete")
 
     def _handle_update(self, sender, instance, **kwargs):  # pylint: disable=W0613
         """Fires when an object is created or updated."""
-        if isinstance(instance, ObjectChange):
+        if sender is ObjectChange:
             # ignore ObjectChange instances
             return
 
@@ -135,9 +171,16 @@ class AutoDoltCommit:
         self.collect_change(instance, msg)
         self.commit = True
 
+    def _handle_m2m(self, sender, instance, action, **kwargs):
+        """Fires when a many-to-many relation of an object is changed."""
+        if not action.startswith("post_"):
+            # the change is recorded once it has been applied
+            return
+        self._handle_update(sender, instance, action=action, **kwargs)
+
     def _handle_delete(self, sender, instance, **kwargs):  # pylint: disable=W0613
         """Fires when an object is deleted."""
-        if isinstance(instance, ObjectChange):
+        if sender is ObjectChange:
             # ignore ObjectChange instances
             return
 
@@ -148,7 +191,7 @@ class AutoDoltCommit:
     def make_commits(self):
         """make_commits creates and saves a Commit object."""
         for db, msgs in self.changes_for_db.items():
-            msg = "; ".join(msgs)
+            msg = self.commit_message(msgs)
             Commit(message=msg).save(
                 user=self.request.user,
                 using=db,
@@ -157,9 +200,16 @@ class AutoDoltCommit:
     def collect_change(self, instance, msg):
         """collect_change stores changes messages for each db."""
         db = self.database_from_instance(instance)
-        if db not in self.changes_for_db:
-            self.changes_for_db[db] = []
-        self.changes_for_db[db].append(msg)
+        # a dict keeps the messages in order without duplicates
+        self.changes_for_db.setdefault(db, {})[msg] = None
+
+    @staticmethod
+    def commit_message(msgs):
+        """commit_message joins change messages into a commit message of at most COMMIT_MESSAGE_MAX_LENGTH."""
+        msg = "; ".join(msgs)
+        if len(msg) > COMMIT_MESSAGE_MAX_LENGTH:
+            msg = msg[: COMMIT_MESSAGE_MAX_LENGTH - 3] + "..."
+        return msg
 
     @staticmethod
     def database_from_instance(instance):
@@ -179,6 +229,16 @@ class AutoDoltCommit:
         return f"""Deleted {instance._meta.verbose_name} "{instance}" """
 
 
+def is_health_check(request):
+    """Returns true if the request is a health check."""
+    return "/health" in request.path
+
+
+def is_static_request(request):
+    """Returns true if the request is for a static or media file."""
+    return any(prefix and request.path.startswith(prefix) for prefix in (settings.STATIC_URL, settings.MEDIA_URL))
+
+
 def branch_from_request(request):
     """
     Returns the active branch from a request
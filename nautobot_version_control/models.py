@@ -1,6 +1,7 @@
 """models.py exposes Dolt primitives such as branches and commits as Django models."""
 
 
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models, connection, connections
 from django.db.models import Q
@@ -8,15 +9,25 @@ from django.db.models.deletion import CASCADE
 from django.urls import reverse
 from django.utils.html import mark_safe, format_html
 from django.dispatch import receiver
-from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete, pre_delete
 
 from nautobot.core.models import BaseModel
 from nautobot.extras.utils import extras_features
 from nautobot.users.models import User
 from nautobot.utilities.querysets import RestrictedQuerySet
 
-from nautobot_version_control.utils import author_from_user, DoltError, db_for_commit, active_branch
-from nautobot_version_control.constants import DOLT_DEFAULT_BRANCH
+from nautobot_version_control.utils import (
+    author_from_user,
+    DoltError,
+    db_for_commit,
+    active_branch,
+    cache_active_branch,
+)
+from nautobot_version_control.constants import (
+    BRANCH_NAMES_CACHE_KEY,
+    BRANCH_NAMES_CACHE_TIMEOUT,
+    DOLT_DEFAULT_BRANCH,
+)
 
 
 class DoltSystemTable(models.Model):
@@ -119,7 +130,8 @@ class Branch(DoltSystemTable):
     def checkout(self):
         """Checkout performs a checkout operation to this branch making it the active_branch."""
         with connection.cursor() as cursor:
-            cursor.execute(f"""SELECT dolt_checkout("{self.name}") FROM dual;""")
+            cursor.execute("SELECT dolt_checkout(%s) FROM dual;", [self.name])
+        cache_active_branch(self.name)
 
     def _branch_meta(self):
         try:
@@ -143,31 +155,20 @@ class Branch(DoltSystemTable):
         self.checkout()
         with connection.cursor() as cursor:
             cursor.execute("SET dolt_force_transaction_commit = 1;")
-            if squash:
-                cursor.execute(
-                    f"""SELECT dolt_merge(
-                        '--squash',
-                        '{merge_branch}'
-                    ) FROM dual;"""
-                )
-            else:
-                cursor.execute(
-                    f"""SELECT dolt_merge(
-                        '--no-ff',
-                        '{merge_branch}'
-                    ) FROM dual;"""
-                )
+            flag = "--squash" if squash else "--no-ff"
+            cursor.execute("SELECT dolt_merge(%s, %s) FROM dual;", [flag, str(merge_branch)])
             success = cursor.fetchone()[0] == 1
             if success:
                 # only commit merged data on success
                 msg = f"""merged "{merge_branch}" into "{self.name}"."""
                 cursor.execute(
-                    f"""SELECT dolt_commit(
+                    """SELECT dolt_commit(
                         '--all',
                         '--allow-empty',
-                        '--message', '{msg}',
-                        '--author', '{author}'
-                    ) FROM dual;"""
+                        '--message', %s,
+                        '--author', %s
+                    ) FROM dual;""",
+                    [msg, author],
                 )
             else:
                 cursor.execute("SELECT dolt_merge('--abort') FROM dual;")  # nosec
@@ -184,8 +185,22 @@ class Branch(DoltSystemTable):
         """Save overrides the model save method."""
         with connection.cursor() as cursor:
             cursor.execute(
-                f"""INSERT INTO dolt_branches (name,hash) VALUES ('{self.name}',hashof('{self.starting_branch}'));"""  # nosec
+                "INSERT INTO dolt_branches (name,hash) VALUES (%s, hashof(%s));",
+                [self.name, str(self.starting_branch)],
             )
+        cache.delete(BRANCH_NAMES_CACHE_KEY)
+
+    @staticmethod
+    def cached_names():
+        """
+        cached_names returns the set of branch names. It's cached for BRANCH_NAMES_CACHE_TIMEOUT seconds,
+        and invalidated when a branch is created or deleted.
+        """
+        return cache.get_or_set(
+            BRANCH_NAMES_CACHE_KEY,
+            lambda: set(Branch.objects.values_list("name", flat=True)),
+            BRANCH_NAMES_CACHE_TIMEOUT,
+        )
 
 
 @receiver(pre_delete, sender=Branch)
@@ -202,6 +217,12 @@ def delete_branch_pre_hook(sender, instance, using, **kwargs):  # pylint: disabl
         raise DoltError(f"Must delete existing pull request(s): [{pr_list}] before deleting branch {instance.name}")
 
 
+@receiver(post_delete, sender=Branch)
+def delete_branch_post_hook(sender, instance, using, **kwargs):  # pylint: disable=W0613
+    """delete_branch_post_hook invalidates the cached branch names once a branch is deleted."""
+    cache.delete(BRANCH_NAMES_CACHE_KEY)
+
+
 class BranchMeta(models.Model):
     """
     BranchMeta class has a 1:1 relation with a Branch. It represents internal of a branch that can't be represented in
@@ -253,17 +274,16 @@ class Commit(DoltSystemTable):
         """merge_base returns the ancestor commit between two commits."""
         with connection.cursor() as c:
             # author credentials not set
-            c.execute(f"SELECT DOLT_MERGE_BASE('{left}', '{right}') FROM dual;")
+            c.execute("SELECT DOLT_MERGE_BASE(%s, %s) FROM dual;", [str(left), str(right)])
             return c.fetchone()[0]
 
     @staticmethod
     def revert(commits, user):
         """revert executes a revert command on a commit which undoes it from the commit log."""
-        args = ", ".join([f"'{c}'" for c in commits])
-        author = author_from_user(user)
-        args += f", '--author', '{author}'"
+        args = [str(c) for c in commits] + ["--author", author_from_user(user)]
+        placeholders = ", ".join(["%s"] * len(args))
         with connection.cursor() as c:
-            c.execute(f"SELECT DOLT_REVERT({args}) FROM dual;")
+            c.execute(f"SELECT DOLT_REVERT({placeholders}) FROM dual;", args)  # nosec
             return c.fetchone()[0]
 
     @property
@@ -285,19 +305,21 @@ class Commit(DoltSystemTable):
 
     def save(self, *args, using="default", user=None, **kwargs):  # pylint: disable=W0221
         """save overrides the Django model save behavior and perform a commit on the database."""
-        msg = self.message.replace('"', "")
         author = author_from_user(user)
         conn = connections[using]
         with conn.cursor() as cursor:
             cursor.execute(
-                f"""
+                """
             SELECT dolt_commit(
                 '--all',
                 '--allow-empty',
-                '--message', "{msg}",
-                '--author', "{author}")
-            FROM dual;"""
+                '--message', %s,
+                '--author', %s)
+            FROM dual;""",
+                [self.message, author],
             )
+            # dolt_commit() returns the hash of the new commit
+            self.commit_hash = cursor.fetchone()[0]
 
 
 class CommitAncestor(DoltSystemTable):
@@ -1,18 +1,36 @@
 """tests.py contains unittests for the nautobot version control plugin."""
 
 
-from django.test import override_settings, TransactionTestCase
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import override_settings, RequestFactory, SimpleTestCase, TransactionTestCase
 from django.urls import reverse
 from django.db import connection
 
 from nautobot.utilities.testing import APITestCase, APIViewTestCases
 from nautobot.users.models import User
-from nautobot.dcim.models import Manufacturer
-
+from nautobot.dcim.models import Device, Manufacturer
+from nautobot.dcim.tables import DeviceTable
+
+import nautobot_version_control
+from nautobot_version_control import (
+    diff_table_for_model,
+    diff_table_registry,
+    invalidate_diffable_content_types,
+    register_diff_tables,
+)
+from nautobot_version_control.diffs import _default_diff_tables, diff_querysets, two_dot_diffs
 from nautobot_version_control.models import Branch, Commit, PullRequest, PullRequestReview
 from nautobot_version_control.merge import get_conflicts_count_for_merge
-from nautobot_version_control.utils import active_branch
-from nautobot_version_control.constants import DOLT_DEFAULT_BRANCH
+from nautobot_version_control.middleware import AutoDoltCommit, DoltBranchMiddleware
+from nautobot_version_control.utils import active_branch, cache_active_branch
+from nautobot_version_control.constants import (
+    BRANCH_NAMES_CACHE_KEY,
+    COMMIT_MESSAGE_MAX_LENGTH,
+    DOLT_BRANCH_KEYWORD,
+    DOLT_DEFAULT_BRANCH,
+)
 
 
 @override_settings(DATABASE_ROUTERS=["nautobot_version_control.routers.GlobalStateRouter"])
@@ -72,17 +90,78 @@ class TestBranches(DoltTestCase):
         Branch.objects.filter(name="todelete").delete()
         self.assertEqual(Branch.objects.filter(name="todelete").count(), 0)
 
+    def test_active_branch_cache(self):
+        """test_active_branch_cache tests that the cached active branch follows checkouts."""
+        Branch(name="cached", starting_branch=self.default).save()
+        Branch.objects.get(name="cached").checkout()
+        self.assertEqual(active_branch(), "cached")
+
+        # the uncached lookup must agree with the cache
+        cache_active_branch(None)
+        self.assertEqual(active_branch(), "cached")
+
+        Branch.objects.get(name=self.default).checkout()
+        self.assertEqual(active_branch(), self.default)
+
+    def test_active_branch_after_checkout(self):
+        """test_active_branch_after_checkout tests that the branch banner doesn't query for a checked out branch."""
+        Branch.objects.get(name=self.default).checkout()
+        with self.assertNumQueries(0):
+            self.assertEqual(active_branch(), self.default)
+
+    def test_branch_names_cache(self):
+        """test_branch_names_cache tests that the cached branch names are invalidated on save and delete."""
+        self.assertNotIn("cached-names", Branch.cached_names())
+        Branch(name="cached-names", starting_branch=self.default).save()
+        self.assertIsNone(cache.get(BRANCH_NAMES_CACHE_KEY))
+        self.assertIn("cached-names", Branch.cached_names())
+
+        Branch.objects.get(name="cached-names").delete()
+        self.assertIsNone(cache.get(BRANCH_NAMES_CACHE_KEY))
+        self.assertNotIn("cached-names", Branch.cached_names())
+
+    def test_middleware_stale_branch_names(self):
+        """test_middleware_stale_branch_names tests that a stale cached branch falls back to the main branch."""
+        cache.set(BRANCH_NAMES_CACHE_KEY, {self.default, "stale"})
+        request = RequestFactory().get("/")
+        request.session = {DOLT_BRANCH_KEYWORD: "stale"}
+        request._messages = FallbackStorage(request)  # pylint: disable=W0212
+
+        middleware = DoltBranchMiddleware(lambda r: HttpResponse())
+        response = middleware.process_view(request, lambda r: HttpResponse(active_branch()), (), {})
+        self.assertEqual(response.content.decode(), self.default)
+        self.assertEqual(request.session[DOLT_BRANCH_KEYWORD], self.default)
+        self.assertNotIn("stale", Branch.cached_names())
+
+    def test_middleware_stale_active_branch(self):
+        """test_middleware_stale_active_branch tests that a stale cached branch isn't kept as the active branch."""
+        cache.set(BRANCH_NAMES_CACHE_KEY, {self.default, "stale"})
+        # a persistent connection that's still on the deleted branch
+        cache_active_branch("stale")
+        request = RequestFactory().get("/")
+        request.session = {DOLT_BRANCH_KEYWORD: "stale"}
+        request._messages = FallbackStorage(request)  # pylint: disable=W0212
+
+        middleware = DoltBranchMiddleware(lambda r: HttpResponse())
+        response = middleware.process_view(request, lambda r: HttpResponse(active_branch()), (), {})
+        self.assertEqual(response.content.decode(), self.default)
+        self.assertEqual(request.session[DOLT_BRANCH_KEYWORD], self.default)
+
+    def test_commit_save_sets_hash(self):
+        """test_commit_save_sets_hash tests that saving a Commit populates its commit_hash."""
+        commit = Commit(message="commit with a hash")
+        commit.save(user=self.user)
+        self.assertEqual(Commit.objects.get(pk=commit.commit_hash).message, "commit with a hash")
+
     def test_merge_ff(self):
         """test_merge_ff tests whether a ff merge works."""
         Branch(name="ff", starting_branch=self.default).save()
         main = Branch.objects.get(name=self.default)
         other = Branch.objects.get(name="ff")
 
-        Commit(message="commit any changes").save(user=self.user)
-
-        # Commit().save() doesn't update the PK correctly, it appears - .refresh_from_db() fails with
-        # "Commit matching query does not exist". So we need to load it fresh from the DB instead:
-        commit = Commit.objects.order_by("date").last()
+        commit = Commit(message="commit any changes")
+        commit.save(user=self.user)
+        commit.refresh_from_db()
         self.assertEqual(commit.committer, self.user.username)
         self.assertEqual(commit.email, self.user.email)
 
@@ -90,9 +169,9 @@ class TestBranches(DoltTestCase):
         other.checkout()
         Manufacturer.objects.all().delete()
         Manufacturer.objects.create(name="m1", slug="m-1")
-        Commit(message="added a manufacturer").save(user=self.user_no_email)
-
-        commit = Commit.objects.order_by("date").last()
+        commit = Commit(message="added a manufacturer")
+        commit.save(user=self.user_no_email)
+        commit.refresh_from_db()
         self.assertEqual(commit.committer, self.user_no_email.username)
         self.assertEqual(commit.email, f"{self.user_no_email.username}@nautobot.invalid")
 
@@ -310,6 +389,122 @@ class TestPullRequests(DoltTestCase):
         )
 
 
+class TestDiffs(DoltTestCase):
+    """TestDiffs tests the diffs between two commits."""
+
+    def setUp(self):
+        """setUp runs before every test case."""
+        self.user = User.objects.get_or_create(username="diff-test", is_superuser=True)[0]
+
+    def test_two_dot_diffs(self):
+        """test_two_dot_diffs tests the diff of added, modified and removed rows between two commits."""
+        modified = Manufacturer.objects.create(name="modified", slug="modified")
+        removed = Manufacturer.objects.create(name="removed", slug="removed")
+        from_commit = Commit(message="commit the manufacturers")
+        from_commit.save(user=self.user)
+
+        added = Manufacturer.objects.create(name="added", slug="added")
+        # update() leaves `last_updated` as it is, so only the slug changes
+        Manufacturer.objects.filter(pk=modified.pk).update(slug="changed")
+        removed_pk = removed.pk
+        removed.delete()
+        to_commit = Commit(message="change the manufacturers")
+        to_commit.save(user=self.user)
+
+        diffs = two_dot_diffs(from_commit=from_commit, to_commit=to_commit)
+        # models without changes are left out
+        self.assertEqual([diff["name"] for diff in diffs], ["Manufacturer Diffs"])
+        diff = diffs[0]
+        self.assertEqual((diff["added"], diff["modified"], diff["removed"]), (1, 1, 1))
+
+        table = diff["table"]
+        records = [row.record for row in table.rows]
+        self.assertEqual([record.pk for record in records], sorted([added.pk, modified.pk, removed_pk]))
+        diff_types = {record.pk: record.diff["diff_type"] for record in records}
+        self.assertEqual(diff_types, {added.pk: "added", modified.pk: "modified", removed_pk: "removed"})
+
+        changed = next(record for record in records if record.pk == modified.pk)
+        self.assertEqual(table.count_diffs(changed.diff), 1)
+        self.assertIn("changed (1)", table.render_diff(None, changed))
+
+    def test_diff_querysets_without_relations(self):
+        """test_diff_querysets_without_relations tests that a diff table without relations doesn't join any."""
+        Manufacturer.objects.create(name="m1", slug="m-1")
+        commit = Commit(message="commit m1")
+        commit.save(user=self.user)
+
+        tbl_name = Manufacturer._meta.db_table
+        columns = set(diff_table_for_model(Manufacturer).base_columns)
+        to_queryset, from_queryset = diff_querysets(Manufacturer, tbl_name, columns, commit, commit)
+        self.assertIs(to_queryset.query.select_related, False)
+        self.assertIs(from_queryset.query.select_related, False)
+
+
+class TestDiffTableRegistry(SimpleTestCase):
+    """TestDiffTableRegistry tests the registration of diff tables."""
+
+    def setUp(self):
+        """setUp runs before every test case."""
+        self.registry = {app_label: dict(tables) for app_label, tables in diff_table_registry().items()}
+
+    def tearDown(self):
+        """tearDown runs after every test case."""
+        registry = diff_table_registry()
+        registry.clear()
+        registry.update(self.registry)
+        invalidate_diffable_content_types()
+
+    def test_register_one_table(self):
+        """test_register_one_table tests that registering a table keeps the default tables of its app label."""
+
+        class MyDeviceTable(DeviceTable):
+            """MyDeviceTable replaces the default device diff table."""
+
+        register_diff_tables({"dcim": {"device": MyDeviceTable}})
+        self.assertIs(diff_table_for_model(Device), MyDeviceTable)
+        for model, table in self.registry["dcim"].items():
+            if model != "device":
+                self.assertIs(diff_table_registry()["dcim"][model], table)
+        self.assertIs(diff_table_for_model(Manufacturer), self.registry["dcim"]["manufacturer"])
+
+    def test_register_one_table_before_defaults(self):
+        """test_register_one_table_before_defaults tests that the defaults of an app label fill in around a table."""
+
+        class MyDeviceTable(DeviceTable):
+            """MyDeviceTable replaces the default device diff table."""
+
+        # plugins register their tables in ready(), before the defaults are registered on first use
+        diff_table_registry().clear()
+        nautobot_version_control.__DEFAULT_DIFF_TABLES_REGISTERED__ = False
+        register_diff_tables({"dcim": {"device": MyDeviceTable}})
+        self.assertIs(diff_table_for_model(Device), MyDeviceTable)
+        self.assertIs(diff_table_for_model(Manufacturer), self.registry["dcim"]["manufacturer"])
+        self.assertEqual(set(diff_table_registry()["dcim"]), set(_default_diff_tables()["dcim"]))
+
+
+class TestAutoDoltCommit(SimpleTestCase):
+    """TestAutoDoltCommit tests the commit messages built by AutoDoltCommit."""
+
+    def test_duplicate_changes(self):
+        """test_duplicate_changes asserts that a change is only listed once in the commit message."""
+        auto_commit = AutoDoltCommit(request=None)
+        manufacturer = Manufacturer(name="m1", slug="m-1")
+        auto_commit.collect_change(manufacturer, "Updated manufacturer m1")
+        auto_commit.collect_change(manufacturer, "Updated manufacturer m1")
+        auto_commit.collect_change(manufacturer, "Deleted manufacturer m1")
+        msgs = auto_commit.changes_for_db[manufacturer._state.db]  # pylint: disable=W0212
+        self.assertEqual(
+            AutoDoltCommit.commit_message(msgs),
+            "Updated manufacturer m1; Deleted manufacturer m1",
+        )
+
+    def test_long_commit_message(self):
+        """test_long_commit_message asserts that commit messages are truncated."""
+        msg = AutoDoltCommit.commit_message([f"Updated manufacturer m{i}" for i in range(1000)])
+        self.assertEqual(len(msg), COMMIT_MESSAGE_MAX_LENGTH)
+        self.assertTrue(msg.endswith("..."))
+
+
 @override_settings(DATABASE_ROUTERS=["nautobot_version_control.routers.GlobalStateRouter"])
 class TestPullRequestReviewsApi(APITestCase, APIViewTestCases):
     """TestPullRequestReviewsApi tests whether the PullRequestReview model api."""
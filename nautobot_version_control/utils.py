@@ -3,8 +3,11 @@
 
 from contextlib import contextmanager
 from copy import deepcopy
+from functools import lru_cache
+import threading
 
 from django.db import connection, connections
+from MySQLdb.cursors import SSCursor
 
 from nautobot_version_control.constants import DB_NAME, DOLT_BRANCH_KEYWORD
 
@@ -29,6 +32,7 @@ def author_from_user(user):
     return "unknown <unknown@nautobot.invalid>"
 
 
+@lru_cache(maxsize=1024)
 def is_dolt_model(model):
     """
     Returns `True` if `instance` is an instance of
@@ -45,13 +49,39 @@ def alter_session_branch(sess=None, branch=None):
     sess[DOLT_BRANCH_KEYWORD] = branch
 
 
+# Caches the branch checked out on the default connection. Django connections
+# are per-thread, so is the cache. It's keyed by the underlying DB-API connection
+# as a reconnect starts a new Dolt session on the default branch.
+_active_branch_tls = threading.local()
+
+
 def active_branch():
     """active_branch returns the current active_branch from dolt."""
+    name = cached_active_branch()
+    if name is not None:
+        return name
     with connection.cursor() as cursor:
         cursor.execute("SELECT active_branch() FROM dual;")
         return cursor.fetchone()[0]
 
 
+def cached_active_branch():
+    """cached_active_branch returns the cached active branch of the default connection, or `None` if it isn't known."""
+    name = getattr(_active_branch_tls, "name", None)
+    if name is not None and _active_branch_tls.conn is connection.connection:
+        return name
+    return None
+
+
+def cache_active_branch(name):
+    """
+    cache_active_branch records `name` as the branch checked out on the default connection,
+    so that `active_branch()` doesn't query for it. Passing `None` clears the cache.
+    """
+    _active_branch_tls.name = name
+    _active_branch_tls.conn = connection.connection if name is not None else None
+
+
 def db_for_commit(commit):
     """
     Uses "database-revision" syntax
@@ -68,12 +98,31 @@ def db_for_commit(commit):
     return cm_hash
 
 
+@contextmanager
+def unbuffered_cursor(using="default"):
+    """
+    unbuffered_cursor makes cursors of the `using` connection server-side (MySQLdb `SSCursor`),
+    so that query results are streamed from the database instead of being buffered in client memory.
+    No other query may run on the connection while a streamed result is being read.
+    """
+    conn = connections[using]
+    conn.ensure_connection()
+    prev = conn.connection.cursorclass
+    conn.connection.cursorclass = SSCursor
+    try:
+        yield
+    finally:
+        conn.connection.cursorclass = prev
+
+
 @contextmanager
 def query_on_branch(branch):
     """query_on_branch checkout to another branch, runs a query, and checkouts back to main."""
     # TODO: remove in favor of db_for_commit
     with connection.cursor() as cursor:
         prev = active_branch()
-        cursor.execute(f"""SELECT dolt_checkout("{branch}") FROM dual;""")
+        cursor.execute("SELECT dolt_checkout(%s) FROM dual;", [str(branch)])
+        cache_active_branch(str(branch))
         yield
-        cursor.execute(f"""SELECT dolt_checkout("{prev}") FROM dual;""")
+        cursor.execute("SELECT dolt_checkout(%s) FROM dual;", [prev])
+        cache_active_branch(prev)